@@ -1,12 +1,13 @@
 """
 Interactive Solara Dashboard for Inflation Target ABM with Banking Inclusion Effects
 """
+import functools
+
 import solara
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import altair as alt
-from model import InflationModel
+from model import run_simulation
 
 # Initialize model parameters with reactive variables
 num_households = solara.reactive(100)
@@ -17,10 +18,11 @@ inflation_target = solara.reactive(0.03)
 initial_inflation = solara.reactive(0.08)
 inflation_shock_size = solara.reactive(0.0)
 simulation_steps = solara.reactive(100)
+seed = solara.reactive("")  # Blank draws a new sample on every run
 
 # Reactive variables for storing results
 model_results = solara.reactive(None)
-current_model = solara.reactive(None)
+results_params = solara.reactive(None)
 simulation_complete = solara.reactive(False)
 steps_to_target = solara.reactive(None)
 
@@ -42,45 +44,79 @@ def parameter_controls():
             solara.SliderFloat("Inflation Target", value=inflation_target, min=0.01, max=0.1, step=0.005, format="%.3f")
             solara.SliderFloat("Initial Inflation", value=initial_inflation, min=0.02, max=0.2, step=0.01, format="%.2f")
             solara.SliderFloat("Inflation Shock Size", value=inflation_shock_size, min=0.0, max=0.1, step=0.01, format="%.2f")
+            solara.InputText("Random Seed (blank for a new sample each run)", value=seed)
             solara.SliderInt("Simulation Steps", value=simulation_steps, min=20, max=300, step=10)
 
 
+def _current_params():
+    """Model parameters currently selected in the controls, as a hashable tuple"""
+    return (
+        ("num_households", num_households.value),
+        ("num_firms", num_firms.value),
+        ("banking_inclusion_rate", banking_inclusion_rate.value),
+        ("formal_sector_size", formal_sector_size.value),
+        ("inflation_target", inflation_target.value),
+        ("initial_inflation", initial_inflation.value),
+        ("inflation_shock_size", inflation_shock_size.value),
+        ("seed", int(seed.value) if seed.value.strip().isdigit() else None),
+    )
+
+
+def _simulate(params, steps, tolerance=0.005):
+    """
+    Run one simulation. Runs with a fixed seed reuse the result of an identical
+    earlier run; unseeded runs always draw a new sample.
+    Returns (results DataFrame, steps to target); callers must not mutate the DataFrame.
+    """
+    if dict(params)["seed"] is None:
+        return run_simulation(dict(params), steps, tolerance)
+    return _simulate_cached(params, steps, tolerance)
+
+
+@functools.lru_cache(maxsize=32)
+def _simulate_cached(params, steps, tolerance=0.005):
+    """Memoized run_simulation, only used for seeded runs"""
+    return run_simulation(dict(params), steps, tolerance)
+
+
+def _run_experiments(params, steps, inclusion_rates, tolerance=0.005):
+    """
+    Run one simulation per banking inclusion rate (memoized for seeded runs,
+    like ``_simulate``).
+    Returns a list of (results DataFrame, steps to target) in the order of the rates.
+    """
+    if dict(params)["seed"] is None:
+        return _experiment_runs(params, steps, inclusion_rates, tolerance)
+    return _experiments_cached(params, steps, inclusion_rates, tolerance)
+
+
+@functools.lru_cache(maxsize=32)
+def _experiments_cached(params, steps, inclusion_rates, tolerance=0.005):
+    """Memoized _experiment_runs, only used for seeded runs"""
+    return _experiment_runs(params, steps, inclusion_rates, tolerance)
+
+
+def _experiment_runs(params, steps, inclusion_rates, tolerance):
+    # Each run takes milliseconds, so running them in turn is faster than
+    # starting worker processes
+    return [
+        run_simulation(dict(params, banking_inclusion_rate=rate), steps, tolerance)
+        for rate in inclusion_rates
+    ]
+
+
 @solara.component
 def run_controls():
     """Component with buttons to run simulation and experiments"""
     def run_single_simulation():
         simulation_complete.set(False)
-        model = InflationModel(
-            num_households=num_households.value,
-            num_firms=num_firms.value,
-            banking_inclusion_rate=banking_inclusion_rate.value,
-            formal_sector_size=formal_sector_size.value,
-            inflation_target=inflation_target.value,
-            initial_inflation=initial_inflation.value,
-            inflation_shock_size=inflation_shock_size.value
-        )
-        current_model.set(model)
+        params = _current_params()
         
-        # Run the model for specified steps
-        for _ in range(simulation_steps.value):
-            model.step()
+        # Run the model for specified steps (identical seeded scenarios are reused)
+        results, stabilized_step = _simulate(params, simulation_steps.value)
         
-        # Collect results
-        results = model.datacollector.get_model_vars_dataframe()
+        results_params.set(dict(params))
         model_results.set(results)
-        
-        # Calculate steps to target
-        target = inflation_target.value
-        tolerance = 0.005  # Half percentage point
-        
-        stabilized_step = None
-        for step in range(min(5, len(results)), len(results)):
-            # Check if inflation has been close to target for several steps
-            recent_gap = abs(results["Inflation"].iloc[step-5:step] - target)
-            if all(gap < tolerance for gap in recent_gap):
-                stabilized_step = step - 5
-                break
-        
         steps_to_target.set(stabilized_step)
         simulation_complete.set(True)
     
@@ -89,40 +125,11 @@ def run_controls():
         run_experiment.set(True)
         
         # Define different banking inclusion rates to test
-        inclusion_rates = [0.2, 0.4, 0.6, 0.8]
-        results = {}
+        inclusion_rates = (0.2, 0.4, 0.6, 0.8)
+        runs = _run_experiments(_current_params(), simulation_steps.value, inclusion_rates)
         
-        for rate in inclusion_rates:
-            # Run model with this inclusion rate
-            model = InflationModel(
-                num_households=num_households.value,
-                num_firms=num_firms.value,
-                banking_inclusion_rate=rate,
-                formal_sector_size=formal_sector_size.value,
-                inflation_target=inflation_target.value,
-                initial_inflation=initial_inflation.value,
-                inflation_shock_size=inflation_shock_size.value
-            )
-            
-            # Run for specified steps
-            for _ in range(simulation_steps.value):
-                model.step()
-            
-            # Collect results
-            model_data = model.datacollector.get_model_vars_dataframe()
-            
-            # Calculate steps to target
-            target = inflation_target.value
-            tolerance = 0.005  # Half percentage point
-            
-            stabilized_step = None
-            for step in range(min(5, len(model_data)), len(model_data)):
-                # Check if inflation has been close to target for several steps
-                recent_gap = abs(model_data["Inflation"].iloc[step-5:step] - target)
-                if all(gap < tolerance for gap in recent_gap):
-                    stabilized_step = step - 5
-                    break
-            
+        results = {}
+        for rate, (model_data, stabilized_step) in zip(inclusion_rates, runs):
             results[rate] = {
                 "data": model_data,
                 "steps_to_target": stabilized_step
@@ -148,6 +155,31 @@ def run_controls():
         )
 
 
+def _line_chart(data, columns, title, y_title, target=None):
+    """
+    Altair line chart of the given columns (renamed to their legend labels)
+    against the model step, with an optional horizontal inflation target rule
+    """
+    long_data = (
+        data[list(columns)]
+        .rename(columns=columns)
+        .rename_axis("Step")
+        .reset_index()
+        .melt("Step", var_name="Series", value_name="Value")
+    )
+    chart = alt.Chart(long_data).mark_line().encode(
+        x="Step:Q",
+        y=alt.Y("Value:Q", title=y_title),
+        color=alt.Color("Series:N", title=None)
+    )
+    if target is not None:
+        rule = alt.Chart(pd.DataFrame({"Value": [target]})).mark_rule(
+            color="red", strokeDash=[4, 4]
+        ).encode(y="Value:Q")
+        chart = chart + rule
+    return chart.properties(title=title, width=320, height=220)
+
+
 @solara.component
 def result_visualization():
     """Component to display simulation results"""
@@ -158,62 +190,53 @@ def result_visualization():
             return solara.Loading("Running simulation...")
     
     results = model_results.value
-    model = current_model.value
+    target = results_params.value["inflation_target"]
     
     with solara.Card("Simulation Results", elevation=2):
         with solara.Column():
-            # Create matplotlib figure
-            fig = plt.figure(figsize=(12, 8))
-            
-            # First subplot: Inflation and target
-            ax1 = fig.add_subplot(221)
-            results["Inflation"].plot(ax=ax1, label="Current Inflation")
-            ax1.axhline(
-                y=model.central_bank.inflation_target,
-                color='r',
-                linestyle='--',
-                label="Inflation Target"
+            # First chart: Inflation and target
+            inflation_chart = _line_chart(
+                results,
+                {"Inflation": "Current Inflation"},
+                "Inflation Rate Over Time",
+                "Inflation Rate",
+                target=target
             )
-            ax1.set_title("Inflation Rate Over Time")
-            ax1.set_ylabel("Inflation Rate")
-            ax1.legend()
-            ax1.grid(True)
             
-            # Second subplot: Interest rate
-            ax2 = fig.add_subplot(222)
-            results["Interest_Rate"].plot(ax=ax2)
-            ax2.set_title("Central Bank Interest Rate")
-            ax2.set_ylabel("Interest Rate")
-            ax2.grid(True)
-            
-            # Third subplot: Inflation expectations
-            ax3 = fig.add_subplot(223)
-            results["Formal_Inflation_Expectation"].plot(ax=ax3, label="Formal Sector")
-            results["Informal_Inflation_Expectation"].plot(ax=ax3, label="Informal Sector")
-            results["Inflation"].plot(ax=ax3, linestyle='--', label="Actual Inflation")
-            ax3.axhline(
-                y=model.central_bank.inflation_target,
-                color='r',
-                linestyle=':',
-                label="Target"
+            # Second chart: Interest rate
+            interest_chart = _line_chart(
+                results,
+                {"Interest_Rate": "Interest Rate"},
+                "Central Bank Interest Rate",
+                "Interest Rate"
             )
-            ax3.set_title("Inflation Expectations")
-            ax3.set_ylabel("Expected Inflation")
-            ax3.legend()
-            ax3.grid(True)
             
-            # Fourth subplot: Aggregate demand and production
-            ax4 = fig.add_subplot(224)
-            results["Aggregate_Demand"].plot(ax=ax4, label="Aggregate Demand")
-            results["Total_Production"].plot(ax=ax4, label="Total Production")
-            ax4.set_title("Aggregate Demand and Production")
-            ax4.legend()
-            ax4.grid(True)
+            # Third chart: Inflation expectations
+            expectations_chart = _line_chart(
+                results,
+                {
+                    "Formal_Inflation_Expectation": "Formal Sector",
+                    "Informal_Inflation_Expectation": "Informal Sector",
+                    "Inflation": "Actual Inflation"
+                },
+                "Inflation Expectations",
+                "Expected Inflation",
+                target=target
+            )
             
-            plt.tight_layout()
+            # Fourth chart: Aggregate demand and production
+            demand_chart = _line_chart(
+                results,
+                {"Aggregate_Demand": "Aggregate Demand", "Total_Production": "Total Production"},
+                "Aggregate Demand and Production",
+                "Value"
+            )
             
-            # Display the figure in Solara
-            solara.FigureMatplotlib(fig)
+            # Display the charts in Solara (rendered client-side by Vega)
+            solara.FigureAltair(
+                ((inflation_chart | interest_chart) & (expectations_chart | demand_chart))
+                .resolve_scale(color="independent")
+            )
             
             # Display time to reach target
             if steps_to_target.value is not None:
@@ -235,31 +258,18 @@ def experiment_visualization():
     
     with solara.Card("Banking Inclusion Experiment Results", elevation=2):
         with solara.Column():
-            # Create matplotlib figure for experiment results
-            fig = plt.figure(figsize=(12, 8))
+            # First chart: Inflation paths, one column per inclusion rate
+            labels = {rate: f"Banking Inclusion: {rate*100:.0f}%" for rate in results}
+            paths = pd.DataFrame({labels[rate]: result["data"]["Inflation"] for rate, result in results.items()})
+            paths_chart = _line_chart(
+                paths,
+                {label: label for label in paths.columns},
+                "Inflation Convergence by Banking Inclusion Rate",
+                "Inflation Rate",
+                target=inflation_target.value
+            ).properties(width=680)
             
-            # First subplot: Inflation paths
-            ax1 = fig.add_subplot(211)
-            for rate, result in results.items():
-                result["data"]["Inflation"].plot(
-                    ax=ax1,
-                    label=f"Banking Inclusion: {rate*100:.0f}%"
-                )
-            
-            # Add inflation target line
-            ax1.axhline(
-                y=inflation_target.value,
-                color='r',
-                linestyle='--',
-                label="Inflation Target"
-            )
-            ax1.set_title("Inflation Convergence by Banking Inclusion Rate")
-            ax1.set_ylabel("Inflation Rate")
-            ax1.legend()
-            ax1.grid(True)
-            
-            # Second subplot: Bar chart of steps to target
-            ax2 = fig.add_subplot(212)
+            # Second chart: Bar chart of steps to target
             rates = []
             steps = []
             
@@ -271,16 +281,15 @@ def experiment_visualization():
                     rates.append(f"{rate*100:.0f}%")
                     steps.append(simulation_steps.value)  # Use max steps if target not reached
             
-            ax2.bar(rates, steps)
-            ax2.set_title("Time to Reach Inflation Target")
-            ax2.set_xlabel("Banking Inclusion Rate")
-            ax2.set_ylabel("Model Steps")
-            ax2.grid(axis='y')
-            
-            plt.tight_layout()
+            steps_chart = alt.Chart(
+                pd.DataFrame({"Banking Inclusion Rate": rates, "Model Steps": steps})
+            ).mark_bar().encode(
+                x=alt.X("Banking Inclusion Rate:N", sort=None),
+                y="Model Steps:Q"
+            ).properties(title="Time to Reach Inflation Target", width=680, height=220)
             
-            # Display the figure in Solara
-            solara.FigureMatplotlib(fig)
+            # Display the charts in Solara (rendered client-side by Vega)
+            solara.FigureAltair(paths_chart & steps_chart)
             
             # Display summary
             reached_targets = [r for r in results.values() if r["steps_to_target"] is not None]
@@ -1,16 +1,214 @@
 """
 Inflation Target ABM Model with Banking Inclusion Effects
 """
+import platform
+from functools import cached_property
+
 import mesa
 import numpy as np
+import pandas as pd
 from agents import Household, Firm, CentralBank
 
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:  # numba is optional; the pure-Python kernels are used instead
+    HAVE_NUMBA = False
+    
+    def njit(*args, **kwargs):
+        return lambda func: func
+    prange = range
+
+
+# numba is not available on PyPy, whose JIT instead speeds up plain float
+# loops (but not loops over NumPy scalars), so it gets the pure-Python kernels
+STEP_BACKEND = (
+    "numba"
+    if HAVE_NUMBA and platform.python_implementation() != "PyPy"
+    else "python"
+)
+
+
+# Household and firm state is stored in single precision: the quantities
+# are small and well-scaled, and narrower floats halve memory traffic and
+# double the SIMD lanes available to the kernels below
+STATE_DTYPE = np.float32
+
+
+@njit(
+    "f8(f4[:], f4[:], f4[:], f4[:], f4[:], f8, f8, f8)",
+    parallel=True, fastmath=True, cache=True
+)
+def _step_households_numba(savings, income, expected_inflation, adjustment_speed, sensitivity,
+                           consumption_rate, inflation_target, interest_rate):
+    """
+    Household behavior for all households at once, updated in place:
+    1. Receive income
+    2. Update inflation expectations
+    3. Decide consumption based on income, savings, and interest rates
+    
+    Returns aggregate demand.
+    """
+    # Single-precision constants keep the loop from upcasting to float64
+    target = np.float32(inflation_target)
+    spend_rate = np.float32(consumption_rate)
+    rate = np.float32(interest_rate)
+    subsistence = np.float32(0.2)
+    one = np.float32(1.0)
+    
+    aggregate_demand = 0.0
+    for i in prange(income.shape[0]):
+        # Update inflation expectations (formal households adjust faster)
+        expected_inflation[i] += adjustment_speed[i] * (target - expected_inflation[i])
+        
+        # Consumption falls with the interest rate, down to subsistence level
+        consumption = income[i] * spend_rate * (one - sensitivity[i] * rate)
+        consumption = max(consumption, subsistence * income[i])
+        
+        # Save the rest
+        savings[i] += income[i] - consumption
+        aggregate_demand += consumption
+    return aggregate_demand
+
+
+@njit(
+    "UniTuple(f8, 2)(f4[:], f4[:], f4[:], f4[:], f8, f8, f8, f8, f8)",
+    parallel=True, fastmath=True, cache=True
+)
+def _step_firms_numba(price_level, production, capacity, cb_influence, aggregate_demand,
+                      total_capacity, average_expectation, inflation_target, current_inflation):
+    """
+    Firm behavior for all firms at once, updated in place:
+    1. Observe market conditions
+    2. Decide production levels
+    3. Set prices
+    
+    Returns total production and the price index numerator.
+    """
+    # Adjust production based on aggregate demand
+    demand_pressure = aggregate_demand / total_capacity - 1
+    
+    # Cost push factors from demand pressure and the expectations impact are
+    # shared by all firms; only the central bank credibility term varies
+    shared_adjustment = np.float32(max(0.0, demand_pressure) * 0.5 + 0.3 * average_expectation)
+    target_gap = np.float32(inflation_target - current_inflation)
+    utilization_change = np.float32(0.1 * demand_pressure)
+    
+    # Single-precision bounds keep the loop from upcasting to float64
+    min_utilization, max_utilization = np.float32(0.5), np.float32(1.0)
+    min_adjustment, max_adjustment = np.float32(-0.05), np.float32(0.1)
+    one = np.float32(1.0)
+    
+    total_production = 0.0
+    price_index_numerator = 0.0
+    for j in prange(capacity.shape[0]):
+        # Adjust capacity utilization (between 50% and 100%)
+        utilization = production[j] / capacity[j] + utilization_change
+        utilization = max(min_utilization, min(utilization, max_utilization))
+        production[j] = utilization * capacity[j]
+        
+        # Central bank credibility effect (formal firms pay more attention)
+        price_adjustment = shared_adjustment + cb_influence[j] * target_gap
+        
+        # Apply the price adjustment bounded to reasonable changes
+        price_level[j] *= one + max(min_adjustment, min(price_adjustment, max_adjustment))
+        
+        total_production += production[j]
+        price_index_numerator += price_level[j] * production[j]
+    return total_production, price_index_numerator
+
+
+def _step_households_python(savings, income, expected_inflation, adjustment_speed, sensitivity,
+                            consumption_rate, inflation_target, interest_rate):
+    """
+    Pure-Python version of ``_step_households_numba``: the arrays are copied
+    to lists once so the loop only does float arithmetic, then written back
+    
+    Python floats are doubles, so only the stored state is rounded to single
+    precision (when written back), not the arithmetic within a step. A seeded
+    run therefore drifts slightly from the numba backend's trajectory.
+    """
+    savings_list = savings.tolist()
+    expected_list = expected_inflation.tolist()
+    
+    aggregate_demand = 0.0
+    for i, (hh_income, speed, hh_sensitivity) in enumerate(
+        zip(income.tolist(), adjustment_speed.tolist(), sensitivity.tolist())
+    ):
+        expected_list[i] += speed * (inflation_target - expected_list[i])
+        
+        consumption = hh_income * consumption_rate * (1 - hh_sensitivity * interest_rate)
+        consumption = max(consumption, 0.2 * hh_income)
+        
+        savings_list[i] += hh_income - consumption
+        aggregate_demand += consumption
+    
+    savings[:] = savings_list
+    expected_inflation[:] = expected_list
+    return aggregate_demand
+
+
+def _step_firms_python(price_level, production, capacity, cb_influence, aggregate_demand,
+                       total_capacity, average_expectation, inflation_target, current_inflation):
+    """
+    Pure-Python version of ``_step_firms_numba`` (see ``_step_households_python``)
+    """
+    demand_pressure = aggregate_demand / total_capacity - 1
+    shared_adjustment = max(0.0, demand_pressure) * 0.5 + 0.3 * average_expectation
+    target_gap = inflation_target - current_inflation
+    utilization_change = 0.1 * demand_pressure
+    
+    price_list = price_level.tolist()
+    production_list = production.tolist()
+    
+    total_production = 0.0
+    price_index_numerator = 0.0
+    for j, (firm_capacity, influence) in enumerate(zip(capacity.tolist(), cb_influence.tolist())):
+        utilization = production_list[j] / firm_capacity + utilization_change
+        utilization = max(0.5, min(utilization, 1.0))
+        firm_production = utilization * firm_capacity
+        
+        price_adjustment = shared_adjustment + influence * target_gap
+        firm_price = price_list[j] * (1 + max(-0.05, min(price_adjustment, 0.1)))
+        
+        production_list[j] = firm_production
+        price_list[j] = firm_price
+        total_production += firm_production
+        price_index_numerator += firm_price * firm_production
+    
+    price_level[:] = price_list
+    production[:] = production_list
+    return total_production, price_index_numerator
+
+
+if STEP_BACKEND == "numba":
+    _step_households, _step_firms = _step_households_numba, _step_firms_numba
+else:
+    _step_households, _step_firms = _step_households_python, _step_firms_python
+
 
 class InflationModel(mesa.Model):
     """
     Model class for simulating inflation targeting in developing economies
     with varying levels of banking inclusion.
+    
+    Household and firm state is kept as parallel NumPy arrays
+    (``hh_*`` and ``firm_*``) and advanced for all agents at once by the
+    kernels of ``_step_backend`` ("numba", or "python" on PyPy).
     """
+    _step_backend = STEP_BACKEND
+    
+    # Model-level variables recorded each step, in history column order
+    history_columns = (
+        "Inflation",
+        "Interest_Rate",
+        "Aggregate_Demand",
+        "Total_Production",
+        "Inflation_Gap",
+        "Formal_Inflation_Expectation",
+        "Informal_Inflation_Expectation"
+    )
+    
     def __init__(
         self,
         num_households=100,
@@ -19,9 +217,11 @@ class InflationModel(mesa.Model):
         formal_sector_size=0.7,
         inflation_target=0.03,
         initial_inflation=0.08,  # Starting with an inflation shock
-        inflation_shock_size=0.0
+        inflation_shock_size=0.0,
+        seed=None
     ):
         super().__init__()
+        self.rng = np.random.default_rng(seed)
         self.num_households = num_households
         self.num_firms = num_firms
         self.banking_inclusion_rate = banking_inclusion_rate
@@ -34,84 +234,90 @@ class InflationModel(mesa.Model):
         self.aggregate_demand = 0
         self.total_production = 0
         self.price_index_numerator = 0
-        self.total_production_capacity = 0
-        
-        # Schedule for activating agents
-        self.schedule = mesa.time.RandomActivation(self)
-        
-        # Data collection
-        self.datacollector = mesa.DataCollector(
-            model_reporters={
-                "Inflation": lambda m: m.current_inflation,
-                "Interest_Rate": lambda m: m.central_bank.interest_rate,
-                "Aggregate_Demand": lambda m: m.aggregate_demand,
-                "Total_Production": lambda m: m.total_production,
-                "Inflation_Gap": lambda m: m.current_inflation - m.central_bank.inflation_target,
-                "Formal_Inflation_Expectation": lambda m: m.get_formal_inflation_expectation(),
-                "Informal_Inflation_Expectation": lambda m: m.get_informal_inflation_expectation()
-            },
-            agent_reporters={
-                "Formal": lambda a: getattr(a, "formal", None),
-                "Type": lambda a: type(a).__name__,
-                "Expected_Inflation": lambda a: getattr(a, "expected_inflation", None),
-                "Price_Level": lambda a: getattr(a, "price_level", None),
-                "Savings": lambda a: getattr(a, "savings", None)
-            }
-        )
+        
+        # Data collection: one row of model-level variables per step, stored
+        # in a preallocated buffer that doubles in size when it fills up
+        self._history = np.empty((128, len(self.history_columns)))
+        self._history_length = 0
         
         # Create the Central Bank agent
         self.central_bank = CentralBank(0, self, inflation_target=inflation_target)
-        self.schedule.add(self.central_bank)
-        
-        # Create household agents
-        for i in range(1, num_households + 1):
-            # Determine if household is formal (banked)
-            is_formal = np.random.random() < banking_inclusion_rate
-            
-            # Create household with different parameters based on formality
-            base_income = np.random.normal(50, 15)  # Base income distribution
-            income_factor = 1.2 if is_formal else 0.8  # Formal households have higher income
-            h = Household(
-                i,
-                self,
-                formal=is_formal,
-                savings=np.random.normal(100, 30) * income_factor,
-                income=base_income * income_factor
-            )
-            self.schedule.add(h)
-        
-        # Create firm agents
-        for i in range(num_households + 1, num_households + num_firms + 1):
-            # Determine if firm is in formal sector
-            is_formal = np.random.random() < formal_sector_size
-            
-            # Create firm with different parameters based on formality
-            base_capacity = np.random.normal(100, 20)
-            capacity_factor = 1.3 if is_formal else 0.7  # Formal firms have higher capacity
-            capacity = base_capacity * capacity_factor
-            
-            f = Firm(i, self, formal=is_formal, production_capacity=capacity)
-            self.schedule.add(f)
-            self.total_production_capacity += capacity
+        
+        # Household state (one entry per household, all drawn in one batch)
+        # Determine which households are formal (banked)
+        self.hh_formal = self.rng.random(num_households) < banking_inclusion_rate
+        income_factor = np.where(self.hh_formal, 1.2, 0.8)  # Formal households have higher income
+        self.hh_income = (self.rng.normal(50, 15, num_households) * income_factor).astype(STATE_DTYPE)
+        self.hh_savings = (self.rng.normal(100, 30, num_households) * income_factor).astype(STATE_DTYPE)
+        self.hh_expected_inflation = np.full(num_households, initial_inflation, dtype=STATE_DTYPE)
+        # Households never change sector, so label (0 informal, 1 formal)
+        # and count each group once
+        self._hh_group = self.hh_formal.astype(np.intp)
+        self._num_informal, self._num_formal = np.bincount(self._hh_group, minlength=2)
+        
+        # Firm state (one entry per firm, all drawn in one batch)
+        # Determine which firms are in the formal sector
+        self.firm_formal = self.rng.random(num_firms) < formal_sector_size
+        capacity_factor = np.where(self.firm_formal, 1.3, 0.7)  # Formal firms have higher capacity
+        self.firm_capacity = (self.rng.normal(100, 20, num_firms) * capacity_factor).astype(STATE_DTYPE)
+        self.firm_production = self.firm_capacity * 0.8  # Starting at 80% capacity
+        self.firm_price_level = np.ones(num_firms, dtype=STATE_DTYPE)
+        self.total_production_capacity = float(self.firm_capacity.sum(dtype=float))
+        
+        # Behavioral constants depend only on formality, so compute them once
+        # Formal households adjust expectations faster and react more to interest rates
+        self.hh_adj_speed = np.where(self.hh_formal, 0.5, 0.2).astype(STATE_DTYPE)
+        self.hh_sensitivity = np.where(self.hh_formal, 0.5, 0.1).astype(STATE_DTYPE)
+        # Formal firms are more responsive to central bank signals
+        self.firm_cb_influence = np.where(self.firm_formal, 0.8, 0.3).astype(STATE_DTYPE)
         
         # Apply initial inflation shock if specified
         if inflation_shock_size > 0:
             self.current_inflation += inflation_shock_size
         
+        self._cache_inflation_expectations()
+        
         # Collect initial data
-        self.datacollector.collect(self)
+        self._record()
     
     def step(self):
         """
         Model step function: advance the model by one step
         """
-        # Reset aggregates for this step
-        self.aggregate_demand = 0
-        self.total_production = 0
-        self.price_index_numerator = 0
+        # Read the policy scalars once; the kernels take them as plain floats
+        central_bank = self.central_bank
+        inflation_target = central_bank.inflation_target
+        interest_rate = central_bank.interest_rate
         
-        # Run all agent steps
-        self.schedule.step()
+        # Households consume first, firms then react to the full demand,
+        # and the central bank sets policy once production is known. The
+        # updates are order-invariant within each class, so no scheduler
+        # (and no shuffling) is needed
+        self.aggregate_demand = _step_households(
+            self.hh_savings,
+            self.hh_income,
+            self.hh_expected_inflation,
+            self.hh_adj_speed,
+            self.hh_sensitivity,
+            Household.consumption_rate,
+            inflation_target,
+            interest_rate
+        )
+        self._cache_inflation_expectations()
+        
+        self.total_production, self.price_index_numerator = _step_firms(
+            self.firm_price_level,
+            self.firm_production,
+            self.firm_capacity,
+            self.firm_cb_influence,
+            self.aggregate_demand,
+            self.total_production_capacity,
+            self._avg_exp_infl,
+            inflation_target,
+            self.current_inflation
+        )
+        
+        central_bank.step()
         
         # Calculate new price index (weighted by production)
         self.previous_price_index = self.price_index
@@ -122,40 +328,135 @@ class InflationModel(mesa.Model):
         self.current_inflation = (self.price_index / self.previous_price_index) - 1
         
         # Collect data
-        self.datacollector.collect(self)
+        self._record()
     
-    def get_average_inflation_expectation(self):
+    def _record(self):
         """
-        Calculate the average inflation expectation across all households
+        Append the current model-level variables to the history
         """
-        households = [agent for agent in self.schedule.agents if isinstance(agent, Household)]
-        if not households:
-            return self.current_inflation
+        if self._history_length == len(self._history):
+            self._history = np.concatenate([self._history, np.empty_like(self._history)])
+        
+        self._history[self._history_length] = (
+            self.current_inflation,
+            self.interest_rate,
+            self.aggregate_demand,
+            self.total_production,
+            self.inflation_gap,
+            self.get_formal_inflation_expectation(),
+            self.get_informal_inflation_expectation()
+        )
+        self._history_length += 1
+    
+    @property
+    def interest_rate(self):
+        """
+        Current policy interest rate set by the central bank
+        """
+        return self.central_bank.interest_rate
+    
+    @property
+    def inflation_gap(self):
+        """
+        Deviation of current inflation from the central bank's target
+        """
+        return self.current_inflation - self.central_bank.inflation_target
+    
+    def get_history(self, name):
+        """
+        Return the collected values of one model-level variable as a NumPy array
+        """
+        column = self.history_columns.index(name)
+        return self._history[:self._history_length, column].copy()
+    
+    def steps_to_target(self, tolerance=0.005, window=5):
+        """
+        Return the first step from which the inflation gap stays within
+        tolerance for `window` consecutive steps, or None if it never does
+        """
+        within = np.abs(self.get_history("Inflation_Gap")) < tolerance
+        if within.size < window:
+            return None
+        
+        # Count in-tolerance steps over every window in a single pass
+        full_windows = np.convolve(within.astype(int), np.ones(window, dtype=int), "valid") == window
+        if not full_windows.any():
+            return None
+        
+        return int(np.argmax(full_windows))
+    
+    def to_dataframe(self):
+        """
+        Return the collected model-level variables as a DataFrame (one row per step)
+        """
+        return pd.DataFrame(self._history[:self._history_length], columns=list(self.history_columns))
+    
+    @cached_property
+    def households(self):
+        """
+        Household agents viewing the household arrays (created on first access)
+        """
+        return [Household(i + 1, self, idx=i) for i in range(self.num_households)]
+    
+    @cached_property
+    def firms(self):
+        """
+        Firm agents viewing the firm arrays (created on first access)
+        """
+        first_id = self.num_households + 1
+        return [Firm(first_id + i, self, idx=i) for i in range(self.num_firms)]
+    
+    def _cache_inflation_expectations(self):
+        """
+        Average household expectations once after they change, so firms
+        and reporters can read the values without another pass. The
+        informal and formal sums come from one pass over the array.
+        """
+        informal_sum, formal_sum = np.bincount(
+            self._hh_group, weights=self.hh_expected_inflation, minlength=2
+        )
+        self._informal_exp_infl = informal_sum / max(self._num_informal, 1)
+        self._formal_exp_infl = formal_sum / max(self._num_formal, 1)
         
-        return sum(h.expected_inflation for h in households) / len(households)
+        if self.num_households == 0:
+            self._avg_exp_infl = self.current_inflation
+        else:
+            self._avg_exp_infl = (informal_sum + formal_sum) / self.num_households
+    
+    def get_average_inflation_expectation(self):
+        """
+        Average inflation expectation across all households (cached once per step)
+        """
+        return self._avg_exp_infl
     
     def get_formal_inflation_expectation(self):
         """
-        Calculate average inflation expectation for formal (banked) households
+        Average inflation expectation for formal (banked) households (cached once per step)
         """
-        formal_households = [
-            agent for agent in self.schedule.agents 
-            if isinstance(agent, Household) and agent.formal
-        ]
-        if not formal_households:
+        if self._num_formal == 0:
             return self.current_inflation
         
-        return sum(h.expected_inflation for h in formal_households) / len(formal_households)
+        return self._formal_exp_infl
     
     def get_informal_inflation_expectation(self):
         """
-        Calculate average inflation expectation for informal (unbanked) households
+        Average inflation expectation for informal (unbanked) households (cached once per step)
         """
-        informal_households = [
-            agent for agent in self.schedule.agents 
-            if isinstance(agent, Household) and not agent.formal
-        ]
-        if not informal_households:
+        if self._num_informal == 0:
             return self.current_inflation
         
-        return sum(h.expected_inflation for h in informal_households) / len(informal_households)
\ No newline at end of file
+        return self._informal_exp_infl
+
+
+def run_simulation(model_params, steps=100, tolerance=0.005):
+    """
+    Run a fresh model for the given number of steps and return its results
+    DataFrame and the step at which inflation stabilized near target (or None)
+    
+    Defined at module level so it can be dispatched to worker processes.
+    """
+    model = InflationModel(**model_params)
+    for _ in range(steps):
+        model.step()
+    
+    return model.to_dataframe(), model.steps_to_target(tolerance)
\ No newline at end of file
@@ -1,24 +1,97 @@
 from mesa import Agent
-import random
 import numpy as np
+from numba import njit, prange
+
+# For the neighbor comparisons agent types are quantized to uint8 codes
+# (0 to 254); code 255 marks an empty cell in the model's types grid
+EMPTY_CELL = 255
+# Two agents are similar if their codes differ by at most 10% of the range
+SIMILAR_CODES = 25
+
+
+@njit(cache=True)
+def count_similar(types, x, y, offsets, my_code):
+    '''
+    Count the occupied cells around (x, y) in the types grid and how many of
+    them hold an agent whose type code is within 10% of my_code. Empty cells
+    hold EMPTY_CELL; offsets are the (wrapped) neighborhood offsets.
+    '''
+    width, height = types.shape
+    similar = 0
+    occupied = 0
+    for k in range(offsets.shape[0]):
+        # Accumulate the comparisons directly (no branches) so the loop vectorizes
+        neighbor_code = types[(x + offsets[k, 0]) % width, (y + offsets[k, 1]) % height]
+        is_occupied = neighbor_code != EMPTY_CELL
+        occupied += is_occupied
+        similar += is_occupied & (abs(np.int16(neighbor_code) - np.int16(my_code)) <= SIMILAR_CODES)
+    return similar, occupied
+
+
+@njit(parallel=True, cache=True)
+def plan_moves(types, positions, agent_types, type_codes, thresholds, move_costs, candidates, offsets):
+    '''
+    Basic decision rule for every agent at once, against the grid as it is at
+    the start of the step. Returns whether each agent is satisfied and, for
+    the others, the index of its best candidate cell (-1 to stay put).
+
+    For the agent to be satisfied, the income class of their neighbor should
+    be around 10% far from their incom size, for a share of neighbors of at
+    least their own threshold. The 10% threshold was looking at
+    https://metop.io/insights/agqp map in Chicago with average wage by
+    neighborhood and its variation.
+    '''
+    num_agents, num_candidates = candidates.shape[0], candidates.shape[1]
+    satisfied = np.zeros(num_agents, dtype=np.bool_)
+    choice = np.full(num_agents, -1, dtype=np.int64)
+    for i in prange(num_agents):
+        my_type = agent_types[i]
+        my_code = type_codes[i]
+
+        # Satisfaction check (an agent without neighbors is never satisfied)
+        similar, occupied = count_similar(types, positions[i, 0], positions[i, 1], offsets, my_code)
+        if occupied > 0 and similar / occupied >= thresholds[i]:
+            satisfied[i] = True
+            continue
+
+        # Assumption: A function of effective costs such that poorer agents are 
+        # more sensitive to cost. The 0.01 is to ensure we are not dividing by 0.
+        effective_cost = move_costs[i] * (1 / (my_type + 0.01))
+
+        # Check cost and similarity at each candidate; cells without any
+        # neighbor are never chosen
+        best_score = -np.inf
+        for c in range(num_candidates):
+            similar, occupied = count_similar(types, candidates[i, c, 0], candidates[i, c, 1], offsets, my_code)
+            if occupied == 0:
+                continue
+            score = similar / occupied - effective_cost
+            if score > best_score:
+                best_score = score
+                choice[i] = c
+    return satisfied, choice
+
 
 class SchellingAgent(Agent):
     ## Initiate agent instance, inherit model trait from parent class
-    def __init__(self, model):
+    def __init__(self, model, income_class, threshold, idx):
         super().__init__(model)
+        # Row of this agent in the model's per-agent arrays
+        self.idx = idx
 
         # CHANGE 1
         # Set agent type using a skwewed distribution (US income distribution)
-        # instead of binary type
-        skw_income = np.random.lognormal(mean=0, sigma=0.8) 
-        self.income_class = skw_income / (1 + skw_income) #Normalized 0 to 1
+        # instead of binary type (drawn for all agents at once by the model)
+        self.income_class = income_class #Normalized 0 to 1
         
         self.type = self.income_class
+        # Quantized type used for the neighbor comparisons
+        self.type_code = int(self.type * EMPTY_CELL)
 
         # CHANGE 2
         # Giving agents different thresholds
         # Assumption: the threshold has a uniform distribution
-        self.threshold = random.uniform(0, 1)
+        self.threshold = threshold
 
 
         # CHANGE 3
@@ -30,77 +103,16 @@ class SchellingAgent(Agent):
         self.move_cost = 1
 
     
-    def is_satisfied(self, neighbors):
-        '''
-        Fraction to check if agent is happy with their neighbors' share alike
-        ratio. For the agent to be satisfied, the income class of their 
-        neighbor should be around 10% far from their incom size. 
-
-        The 10% threshold was looking at https://metop.io/insights/agqp map in 
-        Chicago with average wage by neighborhood and its variation. 
-        '''
-        if not neighbors:
-            return False
-        
-        # They are similar if they have a difference of -at most- 10%
-        similar = sum(1 for n in neighbors 
-                      if abs(n.type - self.type) <= 0.1)
-        
-        share_alike = similar / len(neighbors)
-
-        # Each individual has their own threshold
-        return share_alike >= self.threshold
-    
-    def evaluate_location(self, pos):
-        # Check cost and similarity at a candidate position
-        neighbors = self.model.grid.get_neighbors(pos, moore=True, radius=self.model.radius, include_center=False)
-        if not neighbors:
-            return -float('inf')
-
-        similar = sum(1 for n in neighbors 
-                      if abs(n.type - self.type) <= 0.1)
-        share_alike = similar / len(neighbors)
-
-        # Assumption: A function of effective costs such that poorer agents are 
-        # more sensitive to cost. The 0.01 is to ensure we are not dividing by 0.
-        effective_cost = self.move_cost * (1 / (self.type + 0.01)) 
-        func = share_alike - effective_cost
-        return func
-    
-
-    ## Define basic decision rule
-    def move(self):
-        # Current neighbors
-        neighbors = self.model.grid.get_neighbors(self.pos, moore=True, radius=self.model.radius, include_center=False)
-
-        # Satisfaction check
-        if self.is_satisfied(neighbors):
-            self.model.happy += 1
-            return
-
-        empty_cells = list(self.model.grid.empties)
-
-        # CHANGE 4
-        # The agent only evaluates some empty cells (Not all of them)
-        candidates = random.sample(empty_cells, min(len(empty_cells), 10))  
-
-        best_pos = None
-        best_eval = -float('inf')
-
-        for pos in candidates:
-            eval = self.evaluate_location(pos)
-            if eval > best_eval:
-                best_eval = eval
-                best_pos = pos
-
-        # Move to best location
-        if best_pos:
-            self.model.grid.move_agent(self, best_pos)
-            self.past_moves += 1
-
-            # Adaptive tolerance: if the agent moved multiple times he will adapt
-            # in future steps decreasing their threshold
-            if self.adaptive and self.past_moves >= 10:
-                self.threshold = min(1.0, self.threshold - 0.01)  # Become less picky if moving a lot    
+    ## Move to the location chosen by plan_moves
+    def relocate(self, pos):
+        self.model.grid.move_agent(self, pos)
+        self.model.agent_positions[self.idx] = pos
+        self.past_moves += 1
+
+        # Adaptive tolerance: if the agent moved multiple times he will adapt
+        # in future steps decreasing their threshold
+        if self.adaptive and self.past_moves >= 10:
+            self.threshold = min(1.0, self.threshold - 0.01)  # Become less picky if moving a lot    
+            self.model.agent_thresholds[self.idx] = self.threshold
 
 
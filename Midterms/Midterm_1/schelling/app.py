@@ -7,24 +7,17 @@ from mesa.visualization import (
 )
 
 import matplotlib
-import matplotlib.cm as cm
 import matplotlib.colors as mcolors
 
-# Normalize income values from [1, 100] to [0, 1] for colormap
-norm = mcolors.Normalize(vmin=1, vmax=100)
-cmap = cm.get_cmap("coolwarm")  # Or "viridis", "plasma", etc.
+# Colors for every agent type code (income class quantized to 0-254), looked
+# up once here instead of going through the colormap for each agent per draw
+_cmap = matplotlib.colormaps["viridis"]  # A color map that works well for income gradation
+_COLOR_LUT = [mcolors.to_hex(_cmap(code / 255)) for code in range(256)]
 
 ## Define agent portrayal: color mapped to income
 def agent_portrayal(agent):
-    # Since agent.type (income class) is already normalized to [0, 1]
-    norm = mcolors.Normalize(vmin=0, vmax=1)
-    cmap = cm.get_cmap("viridis")  # A color map that works well for income gradation
-    
-    rgba = cmap(agent.type)  # Maps income directly to color
-    hex_color = mcolors.to_hex(rgba)
-    
     return {
-        "color": hex_color,
+        "color": _COLOR_LUT[agent.type_code],
         "marker": "s",
         "size": 40,
     }
@@ -1,36 +1,145 @@
 # model.py
+import numpy as np
 from mesa import Model
 from mesa.space import SingleGrid
 from mesa.datacollection import DataCollector
-from agents import SchellingAgent
+from agents import EMPTY_CELL, SchellingAgent, plan_moves
+
+
+class TypedGrid(SingleGrid):
+    '''
+    SingleGrid that also keeps the type code of the agent in every cell
+    (EMPTY_CELL marks an empty cell) and the list of empty cells as NumPy arrays. Every place,
+    remove and move goes through the grid, so the arrays are the ground truth
+    agents read their surroundings from instead of mesa agent objects.
+    '''
+    def __init__(self, width, height, torus):
+        super().__init__(width, height, torus)
+        self.types_grid = np.full((width, height), EMPTY_CELL, dtype=np.uint8)
+
+        # Empty cells as rows of an (E, 2) array plus each cell's row in it
+        # (-1 when occupied); only the first num_empty rows are in use
+        self._empty_cells = np.argwhere(self.types_grid == EMPTY_CELL).astype(np.int32)
+        self.empty_slot = np.arange(width * height).reshape(width, height)
+        self.num_empty = width * height
+
+    @property
+    def empties_arr(self):
+        return self._empty_cells[:self.num_empty]
+
+    def place_agent(self, agent, pos):
+        super().place_agent(agent, pos)
+        self.types_grid[pos] = agent.type_code
+        self._take_empty(pos)
+
+    def remove_agent(self, agent):
+        pos = agent.pos
+        if pos is None:
+            return
+        super().remove_agent(agent)
+        self.types_grid[pos] = EMPTY_CELL
+        self._add_empty(pos)
+
+    # No move_agent override: mesa's move_agent goes through remove_agent and
+    # place_agent above, which already keep both arrays up to date
+
+    def _take_empty(self, pos):
+        # Swap-remove pos from the empties with the last row in use
+        slot = self.empty_slot[pos]
+        last = self.num_empty - 1
+        last_cell = self._empty_cells[last]
+        self._empty_cells[slot] = last_cell
+        self.empty_slot[last_cell[0], last_cell[1]] = slot
+        self.empty_slot[pos] = -1
+        self.num_empty = last
+
+    def _add_empty(self, pos):
+        self._empty_cells[self.num_empty] = pos
+        self.empty_slot[pos] = self.num_empty
+        self.num_empty += 1
+
 
 class SchellingModel(Model):
     def __init__(self, width=50, height=50, density=0.7, radius=1, seed=None):
+        # mesa seeds the NumPy generator self.rng from `seed`; every random draw
+        # of the model and its agents, including the order in which step
+        # applies the planned moves, comes from it
         super().__init__(seed=seed)
         self.width = width
         self.height = height
         self.density = density
         self.radius = radius
 
-        self.grid = SingleGrid(width, height, torus=True)
+        self.grid = TypedGrid(width, height, torus=True)
+
+        # Moore neighborhood offsets for the vision radius, computed once.
+        # Offsets are reduced modulo the grid size (and deduplicated) so a
+        # radius that wraps around the torus counts each cell only once
+        r = radius
+        dx, dy = np.mgrid[-r:r + 1, -r:r + 1].reshape(2, -1)
+        offsets = np.unique(np.stack([dx % width, dy % height], axis=1), axis=0)
+        self.neighbor_offsets = offsets[(offsets != 0).any(axis=1)].astype(np.int32)
         self.happy = 0
 
         self.datacollector = DataCollector(
             model_reporters={
                 "happy": "happy",
-                "share_happy": lambda m: (m.happy / len(m.agents)) * 100 if len(m.agents) > 0 else 0
+                "share_happy": lambda m: m.happy * m._share_happy_scale
             }
         )
 
-        for _, pos in self.grid.coord_iter():
-            if self.random.random() < self.density:
-                self.grid.place_agent(SchellingAgent(self), pos)
+        # Decide which cells are occupied with a single draw over the grid
+        occupied = self.rng.random((width, height)) < self.density
+        positions = [tuple(pos) for pos in np.argwhere(occupied).tolist()]
+
+        # Draw every agent's income class and threshold in one batch
+        skw_income = self.rng.lognormal(mean=0, sigma=0.8, size=len(positions))
+        income_classes = skw_income / (1 + skw_income)
+        thresholds = self.rng.uniform(0, 1, size=len(positions))
+
+        self.agent_list = []
+        for idx, (pos, income_class, threshold) in enumerate(zip(positions, income_classes, thresholds)):
+            agent = SchellingAgent(self, income_class, threshold, idx)
+            self.grid.place_agent(agent, pos)
+            self.agent_list.append(agent)
+
+        # Per-agent inputs of plan_moves, one row per agent in agent_list.
+        # Built once; relocate updates the rows of an agent that moves
+        self.agent_positions = np.array(positions, dtype=np.int64).reshape(-1, 2)
+        self.agent_types = np.array([agent.type for agent in self.agent_list])
+        self.agent_type_codes = np.array([agent.type_code for agent in self.agent_list], dtype=np.uint8)
+        self.agent_thresholds = np.array([agent.threshold for agent in self.agent_list])
+        self.agent_move_costs = np.array([agent.move_cost for agent in self.agent_list], dtype=float)
+
+        # Agents are never added or removed, so count them (and the
+        # happy-count to percentage factor) once
+        self._num_agents = len(positions)
+        self._share_happy_scale = 100.0 / self._num_agents if self._num_agents > 0 else 0.0
 
         self.datacollector.collect(self)
 
     def step(self):
-        self.happy = 0
-        self.agents.shuffle_do("move")
-        self.datacollector.collect(self)
-        self.running = self.happy < len(self.agents)
+        # CHANGE 4
+        # Each agent only evaluates some empty cells (Not all of them)
+        empties = self.grid.empties_arr
+        sample = self.rng.integers(max(len(empties), 1), size=(self._num_agents, min(len(empties), 10)))
+        candidates = empties[sample]
+
+        # All agents decide in parallel against the grid at the start of the
+        # step; the moves are then applied one at a time in random order
+        satisfied, choice = plan_moves(
+            self.grid.types_grid, self.agent_positions, self.agent_types, self.agent_type_codes,
+            self.agent_thresholds, self.agent_move_costs, candidates, self.neighbor_offsets
+        )
+        self.happy = int(satisfied.sum())
 
+        for i in self.rng.permutation(self._num_agents):
+            if choice[i] < 0:
+                continue
+            pos = tuple(candidates[i, choice[i]].tolist())
+            # Skip the move if another agent took the cell earlier this step
+            if self.grid.is_cell_empty(pos):
+                self.agent_list[i].relocate(pos)
+
+        self.datacollector.collect(self)
+        self.running = self.happy < self._num_agents